@@ -3,9 +3,9 @@
 import os
 import logging
 import asyncio
-from playwright.async_api import async_playwright
 from dotenv import load_dotenv
-import time
+from src.tools.browser_pool import pool
+from src.tools.linkedin_session import lease, LoginError
 
 # Load environment variables
 load_dotenv()
@@ -17,57 +17,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-STORAGE_STATE_PATH = "linkedin-state.json"
-
-async def ensure_linkedin_login(page, linkedin_username, linkedin_password):
-    """
-    Ensure user is logged into LinkedIn
-    """
-    logger.info("Checking if already logged in...")
-    await page.goto("https://www.linkedin.com/feed/")
-    
-    try:
-        # Check if already logged in by looking for the search bar or feed
-        await page.wait_for_selector("input[aria-label='Search']", timeout=8000)
-        logger.info("Already logged in!")
-        return True
-    except Exception:
-        logger.info("Not logged in, proceeding with login...")
-    
-    # Navigate to login page
-    await page.goto("https://www.linkedin.com/login")
-    await page.wait_for_selector("#username")
-    
-    # Fill login credentials
-    logger.info("Filling login credentials...")
-    await page.fill("#username", linkedin_username)
-    await page.fill("#password", linkedin_password)
-    
-    # Click login button
-    await page.click("button[type='submit']")
-    
-    try:
-        # Wait for successful login (search bar appears)
-        await page.wait_for_selector("input[aria-label='Search']", timeout=60000)
-        logger.info("Login successful!")
-        
-        # Save session state
-        context = page.context
-        await context.storage_state(path=STORAGE_STATE_PATH)
-        return True
-    except Exception as e:
-        logger.error(f"Login failed: {str(e)}")
-        return False
-
-async def post_to_linkedin(content: str, username: str = None, password: str = None, add_hashtags: bool = True) -> str:
+async def post_to_linkedin(content: str, username: str = None, password: str = None, add_hashtags: bool = True, review_seconds: float = 0) -> str:
     """
     Write content to LinkedIn post composer using browser automation (does not actually publish).
+    The browser runs headless by default; set LINKEDIN_HEADLESS=0 to watch the composer being filled.
     
     Args:
         content (str): The content to write in the LinkedIn post composer
         username (str): LinkedIn username/email (optional, falls back to env var)
         password (str): LinkedIn password (optional, falls back to env var)
         add_hashtags (bool): Whether to automatically add relevant hashtags
+        review_seconds (float): How long to keep the composer open for manual review before closing it (default: 0)
     
     Returns:
         str: Success or error message indicating content was written to composer
@@ -88,177 +48,78 @@ async def post_to_linkedin(content: str, username: str = None, password: str = N
     logger.info(f"Starting LinkedIn post automation...")
     logger.info(f"Content length: {len(content)} characters")
     
-    async with async_playwright() as p:
-        try:
-            logger.info("Launching browser...")
-            
-            # Load existing session if available
-            context_args = {}
-            if os.path.exists(STORAGE_STATE_PATH):
-                context_args['storage_state'] = STORAGE_STATE_PATH
-            
-            browser = await p.chromium.launch(headless=False)  # Set to True for headless mode
-            context = await browser.new_context(**context_args)
-            page = await context.new_page()
-            
-            # Login to LinkedIn
-            logged_in = await ensure_linkedin_login(page, linkedin_username, linkedin_password)
-            if not logged_in:
-                await browser.close()
-                return "Login failed. Please check your credentials."
-            
+    try:
+        # Borrow a logged-in page from the browser pool shared with the MCP tools
+        async with lease(linkedin_username, linkedin_password) as page:
             # Navigate to LinkedIn feed
             logger.info("Navigating to LinkedIn feed...")
-            #await page.goto("https://www.linkedin.com/feed/")
+            if not page.url.startswith("https://www.linkedin.com/feed"):
+                await page.goto("https://www.linkedin.com/feed/", wait_until="domcontentloaded")
             #await asyncio.sleep(3)            # Find and click the "Start a post" button using Playwright's text capabilities
             logger.info("Looking for 'Start a post' button...")
-            
+        
+            # All strategies are combined into one locator so they are polled together under a single timeout
+            start_post_button = (
+                page.locator('text="Start a post"')
+                .or_(page.locator('button:has-text("Start a post")'))
+                .or_(page.locator('text=Start a post').locator('xpath=ancestor-or-self::button'))
+                .first
+            )
             try:
-                # Method 1: Use Playwright's text locator (most reliable)
-                logger.info("Trying text-based locator...")
-                start_post_button = page.locator('text="Start a post"').first
-                
-                # Wait for it to be visible
-                await start_post_button.wait_for(timeout=10000)
-                
-                if await start_post_button.is_visible():
-                    logger.info("Found 'Start a post' button using text locator")
-                    await start_post_button.click()
-                else:
-                    raise Exception("Button not visible")
-                    
+                await start_post_button.click(timeout=10000)
             except Exception:
-                try:
-                    # Method 2: Use partial text match
-                    logger.info("Trying partial text match...")
-                    start_post_button = page.locator('button:has-text("Start a post")').first
-                    await start_post_button.wait_for(timeout=5000)
-                    
-                    if await start_post_button.is_visible():
-                        logger.info("Found 'Start a post' button using partial text match")
-                        await start_post_button.click()
-                    else:
-                        raise Exception("Button not visible")
-                        
-                except Exception:
-                    try:
-                        # Method 3: Look for "Start a post" anywhere in the page and click the parent button
-                        logger.info("Trying to find any element containing 'Start a post' text...")
-                        start_post_text = page.locator('text=Start a post').first
-                        await start_post_text.wait_for(timeout=5000)
-                        
-                        # Get the closest button ancestor
-                        button_element = start_post_text.locator('xpath=ancestor-or-self::button').first
-                        
-                        if await button_element.is_visible():
-                            logger.info("Found button containing 'Start a post' text")
-                            await button_element.click()
-                        else:
-                            raise Exception("No clickable button found")
-                            
-                    except Exception:
-                        await browser.close()
-                        return "Error: Could not find the 'Start a post' button on the page. Please make sure you're on the LinkedIn feed page."
-            
+                return "Error: Could not find the 'Start a post' button on the page. Please make sure you're on the LinkedIn feed page."
+        
             logger.info("Successfully clicked 'Start a post' button!")
             #await asyncio.sleep(3)
               # Find the text area using Playwright's text-based capabilities
             logger.info("Looking for post composition text area...")
-            
+        
+            # .first picks by DOM order, not strategy order, so the bare contenteditable
+            # fallback is scoped to the composer dialog to keep it off other editors on the feed
+            text_area = (
+                page.locator('[placeholder*="What do you want to talk about"]')
+                .or_(page.locator('div[role="dialog"] div[contenteditable="true"]'))
+                .or_(page.locator('text=What do you want to talk about').locator('xpath=ancestor::div[1]').locator('[contenteditable]'))
+                .first
+            )
             try:
-                # Method 1: Look for placeholder text "What do you want to talk about?"
-                logger.info("Trying to find text area by placeholder text...")
-                text_area = page.locator('[placeholder*="What do you want to talk about"]').first
                 await text_area.wait_for(timeout=10000)
-                
-                if await text_area.is_visible():
-                    logger.info("Found text area using placeholder text")
-                else:
-                    raise Exception("Text area not visible")
-                    
+                logger.info("Found post composition text area")
             except Exception:
-                try:
-                    # Method 2: Look for any contenteditable div that might be the text area
-                    logger.info("Trying to find contenteditable text area...")
-                    text_area = page.locator('div[contenteditable="true"]').first
-                    await text_area.wait_for(timeout=5000)
-                    
-                    if await text_area.is_visible():
-                        logger.info("Found contenteditable text area")
-                    else:
-                        raise Exception("Text area not visible")
-                        
-                except Exception:
-                    try:
-                        # Method 3: Look for text that says "What do you want to talk about" and find nearby input
-                        logger.info("Looking for 'What do you want to talk about' text...")
-                        placeholder_text = page.locator('text=What do you want to talk about').first
-                        await placeholder_text.wait_for(timeout=5000)
-                          # Find the parent container and look for editable element
-                        parent_container = placeholder_text.locator('xpath=ancestor::div[1]').first
-                        text_area = parent_container.locator('[contenteditable]').first
-                        
-                        if await text_area.is_visible():
-                            logger.info("Found text area near placeholder text")
-                        else:
-                            raise Exception("No editable area found")
-                            
-                    except Exception:
-                        await browser.close()
-                        return "Error: Could not find the post composition text area. The LinkedIn interface may have changed."
-              
+                return "Error: Could not find the post composition text area. The LinkedIn interface may have changed."
+          
             # No hashtags will be added; just use the content as is
             final_content = content
-            
-            # Fill the text area with content
-            logger.info("Filling post content...")
-            await text_area.click()  # Focus on the text area
-            await asyncio.sleep(1)
-              # Clear any existing content and paste new content all at once
-            await page.keyboard.press('Control+a')  # Select all existing content
-            await asyncio.sleep(0.5)
-            
-            # Write content all at once using fill method (fastest)
+        
+            # Write content all at once; fill() focuses, clears and sets the text in one step
             logger.info("Writing content to the text area...")
             await text_area.fill(final_content)
-            await asyncio.sleep(1)
-            
+        
             # Verify content was typed
-            try:
-                typed_content = await text_area.inner_text()
-                if typed_content.strip():
-                    logger.info(f"Content successfully typed! Length: {len(typed_content)} characters")
-                else:
-                    logger.warning("Text area appears empty after typing. Trying alternative method...")
-                    # Alternative method: use fill instead of type
-                    await text_area.fill(final_content)
-                    await asyncio.sleep(1)
-                    logger.info("Used fill method as fallback")
-            except Exception as e:
-                logger.warning(f"Could not verify typed content: {e}")
-                # Try alternative typing method
-                await page.keyboard.type(final_content)
-                logger.info("Used keyboard.type as fallback method")
-            
+            typed_content = await text_area.inner_text()
+            if typed_content.strip():
+                logger.info(f"Content successfully typed! Length: {len(typed_content)} characters")
+            else:
+                logger.warning("Text area appears empty after fill. Typing content instead...")
+                await text_area.press_sequentially(final_content)
+                logger.info("Used press_sequentially as fallback method")
+        
             logger.info("Content filled successfully!")
             logger.info("Content has been written to the LinkedIn post composer. You can now manually review and post it.")
-            
-            # Keep the browser open for manual review (optional - remove this sleep if you want it to close immediately)
-            logger.info("Browser will remain open for 30 seconds for manual review...")
-            await asyncio.sleep(30)
-            
-            await browser.close()
-            
+        
+            # Keep the composer open for manual review only when asked to
+            if review_seconds > 0:
+                logger.info(f"Browser will remain open for {review_seconds} seconds for manual review...")
+                await asyncio.sleep(review_seconds)
+        
             return f"✅ Successfully wrote content to LinkedIn post composer!\n\nContent preview:\n{final_content[:200]}{'...' if len(final_content) > 200 else ''}\n\n📝 The content has been filled in the post composer. You can manually review and publish it."
-            
-        except Exception as e:
-            if 'browser' in locals():
-                try:
-                    await browser.close()
-                except:
-                    pass
-            logger.error(f"Error posting to LinkedIn: {str(e)}")
-            return f"Error: {str(e)}"
+        
+    except LoginError:
+        return "Login failed. Please check your credentials."
+    except Exception as e:
+        logger.error(f"Error posting to LinkedIn: {str(e)}")
+        return f"Error: {str(e)}"
 
 async def demo_linkedin_post():
     """
@@ -283,8 +144,17 @@ What's your experience with AI implementation? Have you seen this pattern in you
 
 #ArtificialIntelligence #BusinessStrategy #Innovation #DigitalTransformation #Leadership #TechTrends"""
 
-    result = await post_to_linkedin(sample_content)
-    print(result)
+    try:
+        result = await post_to_linkedin(sample_content, review_seconds=30)
+        print(result)
+    finally:
+        await pool.close()
+
+async def main(content: str):
+    try:
+        print(await post_to_linkedin(content, review_seconds=30))
+    finally:
+        await pool.close()
 
 # Example usage
 if __name__ == "__main__":
@@ -317,4 +187,4 @@ What's your biggest productivity breakthrough? 👇"""
     print("3. Or run the demo: asyncio.run(demo_linkedin_post())")
     print("\nNote: This tool writes content to the LinkedIn composer but does not publish it.")
     print("You can manually review and publish the content after it's filled in.")
-    asyncio.run(post_to_linkedin(custom_content))
\ No newline at end of file
+    asyncio.run(main(custom_content))
\ No newline at end of file
@@ -1,10 +1,13 @@
 from fastmcp import FastMCP
 from tools.health_check import health_check
-from tools.scrape_linkedin_post import scrape_linkedin_post
+from tools.scrape_linkedin_post import scrape_linkedin_post, scrape_linkedin_posts
 from tools.extract_linkedin_profile_data import extract_linkedin_profile_data
 from tools.extract_company_employees import extract_company_employees
 from tools.send_connection_request import send_connection_request
 from tools.generate_linkedin_content import generate_linkedin_content
+from tools.browser_pool import pool
+from tools import http_utils
+import asyncio
 import logging
 from dotenv import load_dotenv
 
@@ -23,11 +26,20 @@ mcp = FastMCP("LinkedInCommentsScraper", stateless_http=True)
 # Register tools programmatically
 mcp.add_tool(health_check, description="Health check tool to verify MCP server is running properly.")
 mcp.add_tool(scrape_linkedin_post, description="Scrape comments from a LinkedIn post URL. Requires LinkedIn credentials.")
+mcp.add_tool(scrape_linkedin_posts, description="Scrape comments from several LinkedIn post URLs concurrently and return one combined CSV with a post_url column, followed by any posts that could not be scraped. Requires LinkedIn credentials.")
 mcp.add_tool(extract_linkedin_profile_data, description="Extract profile data from a LinkedIn profile URL.")
 mcp.add_tool(extract_company_employees, description="Extract employee information from a company using either company name or LinkedIn company URL. Prioritizes high-designation employees.")
 mcp.add_tool(send_connection_request, description="Send a connection request to a LinkedIn profile URL. (Optional: include a personalized message of at max 180 characters. If the user has not provided any message, but wants to send a personalized invite, use extract_linkedin_profile_data tool to get the profile data and use it to create a personalized message.)")
 mcp.add_tool(generate_linkedin_content, description="Generate engaging LinkedIn posts by analyzing existing posts on a topic. Searches LinkedIn posts via Google(default 10 unless mentioned otherwise), extracts content, and uses AI to create viral, thought-provoking posts for industry leaders. Show the generated output to the user as it is.")
 
+async def run_server():
+    # Run on the same event loop as the shared browser pool and HTTP client so they can be closed on shutdown
+    try:
+        await mcp.run_async()
+    finally:
+        await pool.close()
+        await http_utils.close()
+
 if __name__ == "__main__":
     # For production hosting on Render - use streamable-http transport
     # Get port from environment variable (Render sets PORT)
@@ -41,4 +53,4 @@ if __name__ == "__main__":
         log_level="debug",
     )'''
     # For local development, use the default transport
-    mcp.run()
+    asyncio.run(run_server())
@@ -0,0 +1,172 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Error as PlaywrightError
+from .linkedin_login import STORAGE_STATE_PATH
+
+# Maximum number of browser contexts kept alive for tool calls
+POOL_SIZE = int(os.getenv("LINKEDIN_POOL_SIZE", 3))
+
+# Run Chromium without a window unless LINKEDIN_HEADLESS=0 (e.g. to watch a run locally)
+HEADLESS = os.getenv("LINKEDIN_HEADLESS", "1") != "0"
+
+# Chromium flags that switch off subsystems not needed for reading LinkedIn pages
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--no-zygote",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-accelerated-2d-canvas",
+    "--disable-background-networking",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--mute-audio",
+    "--hide-scrollbars",
+    # Chromium only honours the last --disable-features, so every feature goes in one flag
+    "--disable-features=IsolateOrigins,site-per-process,TranslateUI,Translate,BackForwardCache",
+    "--window-size=1366,768",
+]
+
+# Requests that are aborted before they hit the network.
+# Stylesheets stay: lazy comment loading and the composer's visibility checks depend on layout.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_URL_PATTERNS = ("google-analytics", "doubleclick", "px.ads.linkedin.com", "segment.io")
+
+# Fragments of Playwright's error message when the page, context or browser behind a call is gone
+TARGET_CLOSED_MESSAGES = ("has been closed", "Target closed")
+
+logger = logging.getLogger(__name__)
+
+
+async def block_heavy_resources(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(p in request.url for p in BLOCKED_URL_PATTERNS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def _is_target_closed(error: Exception) -> bool:
+    return isinstance(error, PlaywrightError) and any(m in str(error) for m in TARGET_CLOSED_MESSAGES)
+
+
+class BrowserPool:
+    """
+    Keeps a single Playwright driver and Chromium browser alive for the lifetime of
+    the process and hands out up to `size` browser contexts to tool calls.
+    Contexts are created lazily so they pick up the latest saved storage state.
+    If Chromium crashes or disconnects, the next checkout relaunches it.
+    """
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self._pw = None
+        self._browser = None
+        # Contexts of the current browser that are not leased out
+        self._idle = []
+        # Every context created by the current browser; anything else handed back is closed
+        self._owned = set()
+        # One slot per lease, so at most `size` contexts exist at a time
+        self._slots = asyncio.Semaphore(size)
+        self._lock = asyncio.Lock()
+
+    async def _reset(self):
+        """
+        Forget the browser and its contexts. Contexts still leased out are
+        closed when they come back instead of being reused.
+        """
+        pw = self._pw
+        self._pw = None
+        self._browser = None
+        self._idle = []
+        self._owned = set()
+        if pw is not None:
+            try:
+                await pw.stop()
+            except Exception:
+                pass
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._browser is not None and not self._browser.is_connected():
+                logger.warning("Shared Playwright browser disconnected, relaunching...")
+                await self._reset()
+            if self._browser is None:
+                logger.info("Launching shared Playwright browser...")
+                pw = await async_playwright().start()
+                try:
+                    self._browser = await pw.chromium.launch(headless=HEADLESS, args=BROWSER_ARGS)
+                except Exception:
+                    # Don't leave a driver process behind when Chromium fails to start
+                    await pw.stop()
+                    raise
+                self._pw = pw
+
+    async def _checkout(self):
+        await self._ensure_browser()
+        if self._idle:
+            return self._idle.pop()
+        context_args = {}
+        if os.path.exists(STORAGE_STATE_PATH):
+            context_args['storage_state'] = STORAGE_STATE_PATH
+        context = await self._browser.new_context(**context_args)
+        try:
+            await context.route("**/*", block_heavy_resources)
+        except Exception:
+            await context.close()
+            raise
+        self._owned.add(context)
+        return context
+
+    async def _release(self, context, reusable: bool):
+        if reusable and context in self._owned and self._browser is not None and self._browser.is_connected():
+            self._idle.append(context)
+            return
+        self._owned.discard(context)
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def context(self):
+        """
+        Check out a browser context from the pool and return it when done.
+        A context whose page, context or browser was closed under it is dropped.
+        """
+        async with self._slots:
+            context = await self._checkout()
+            reusable = True
+            try:
+                yield context
+            except Exception as e:
+                if _is_target_closed(e):
+                    reusable = False
+                raise
+            finally:
+                await self._release(context, reusable)
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Open a fresh page on a pooled browser context and close it when done.
+        """
+        async with self.context() as context:
+            page = await context.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+
+    async def close(self):
+        async with self._lock:
+            if self._browser is not None:
+                logger.info("Closing shared Playwright browser...")
+                await self._browser.close()
+            await self._reset()
+
+
+pool = BrowserPool()
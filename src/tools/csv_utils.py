@@ -0,0 +1,14 @@
+import csv
+import io
+
+
+def to_csv(rows: list, fieldnames: list) -> str:
+    """
+    Serialize a list of dicts to CSV text with a header row, formatted like
+    pandas' DataFrame.to_csv(index=False).
+    """
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue()
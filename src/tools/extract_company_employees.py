@@ -1,13 +1,14 @@
 # filepath: d:\CashRich\2025\LinkedIN\comments\comments_mcp\linkedin_mcp_python\src\tools\extract_company_employees.py
 import os
 import logging
-import pandas as pd
 import re
-import asyncio
-from playwright.async_api import async_playwright
-from .linkedin_login import ensure_linkedin_login, STORAGE_STATE_PATH
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from .linkedin_session import lease, LoginError
+from .csv_utils import to_csv
 from urllib.parse import quote_plus
 
+logger = logging.getLogger(__name__)
+
 # High-designation keywords to prioritize in search results
 HIGH_DESIGNATION_KEYWORDS = [
     'CEO', 'CTO', 'CFO', 'COO', 'President', 'Vice President', 'VP', 'SVP',
@@ -17,56 +18,102 @@ HIGH_DESIGNATION_KEYWORDS = [
     'Chief', 'Senior Vice President', 'Executive Vice President', 'EVP', 'Founder'
 ]
 
+# All keywords in one alternation, longest first so "Senior Vice President" counts once rather than as "Senior" + "Vice President"
+DESIGNATION_RE = re.compile(
+    r'\b(?:' + '|'.join(re.escape(k) for k in sorted(set(HIGH_DESIGNATION_KEYWORDS), key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+
+def _designation_score(headline: str) -> int:
+    return len(DESIGNATION_RE.findall(headline)) if headline else 0
+
+EMPLOYEE_FIELDS = ["name", "headline", "profile_url", "designation_score"]
+
+# Elements whose appearance tells us a navigation step has finished
+PEOPLE_CARD_SELECTOR = '.org-people-profile-card__profile-info'
+PEOPLE_TAB_SELECTOR = 'a[href*="/people"]'
+
+async def _wait_for_selector_quietly(page, selector: str, timeout: int = 10000) -> bool:
+    """
+    Wait for a selector to appear, returning False instead of raising on timeout.
+    """
+    try:
+        await page.wait_for_selector(selector, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+# Native-CSS People tab selectors, queried as one union; the text match is only tried if none of them hit
+PEOPLE_TAB_SELECTORS = 'a[data-control-name="people"], a[href$="/people/"], nav a[href*="/people"]'
+PEOPLE_TAB_TEXT_SELECTOR = 'a:has-text("People")'
+
+async def _click_people_tab(page) -> str:
+    """
+    Click the People tab on a company page. Returns the people page URL or None if not found.
+    """
+    try:
+        people_tab = await page.query_selector(PEOPLE_TAB_SELECTORS)
+        if not people_tab:
+            people_tab = await page.query_selector(PEOPLE_TAB_TEXT_SELECTOR)
+        if people_tab:
+            await people_tab.click()
+            await _wait_for_selector_quietly(page, PEOPLE_CARD_SELECTOR, timeout=15000)
+            logger.info("Successfully clicked People tab")
+            return page.url
+        else:
+            logger.warning("Could not find People tab on company page")
+            return None
+    except Exception as e:
+        logger.warning(f"Error clicking People tab: {str(e)}")
+        return None
+
+# Scrolls to the bottom until the page stops growing (bounded), all inside the page in one call
+SCROLL_TO_END_JS = """
+async () => {
+    let prev = -1;
+    for (let i = 0; i < 20 && document.body.scrollHeight !== prev; i++) {
+        prev = document.body.scrollHeight;
+        window.scrollTo(0, prev);
+        await new Promise(resolve => setTimeout(resolve, 300));
+    }
+}
+"""
+
+# Collects link, name and headline of every card from `start` onwards in one evaluate call
+PROFILE_CARDS_JS = """
+start => Array.from(document.querySelectorAll('.org-people-profile-card__profile-info')).slice(start).map(card => {
+    const link = card.querySelector('.artdeco-entity-lockup__title a');
+    const name = card.querySelector('.artdeco-entity-lockup__title a .lt-line-clamp');
+    const headline = card.querySelector('.artdeco-entity-lockup__subtitle .lt-line-clamp');
+    return {
+        profile_url: link ? link.getAttribute('href') : null,
+        name: name ? name.innerText : null,
+        headline: headline ? headline.innerText : null
+    };
+})
+"""
+
 
 async def _navigate_to_people_page(page, company_name: str = None, company_url: str = None) -> str:
     """
     Navigates to the LinkedIn company people page given a company name or company URL.
     Returns the final people page URL or None if not found.
     """
-    logger = logging.getLogger(__name__)
-    
     # Route 1: Direct company people URL provided
     if company_url and '/people' in company_url:
         logger.info(f"Direct people URL provided: {company_url}")
-        await page.goto(company_url)
-        await asyncio.sleep(3)
+        await page.goto(company_url, wait_until="domcontentloaded")
+        await _wait_for_selector_quietly(page, PEOPLE_CARD_SELECTOR, timeout=15000)
         logger.info("Successfully navigated to people page")
         return company_url
     
     # Route 2: Company URL provided (but not people page) - go to company page then click People tab
     elif company_url and '/company/' in company_url:
         logger.info(f"Company URL provided: {company_url}")
-        await page.goto(company_url)
-        await asyncio.sleep(3)
+        await page.goto(company_url, wait_until="domcontentloaded")
+        await _wait_for_selector_quietly(page, PEOPLE_TAB_SELECTOR)
         
-        try:
-            # Look for People tab and click it
-            people_tab_selectors = [
-                'a[data-control-name="people"]',
-                'a[href$="/people/"]',
-                'a:has-text("People")',
-                'nav a[href*="/people"]'
-            ]
-            
-            people_tab = None
-            for selector in people_tab_selectors:
-                people_tab = await page.query_selector(selector)
-                if people_tab:
-                    logger.info(f"Found People tab with selector: {selector}")
-                    break
-            
-            if people_tab:
-                await people_tab.click()
-                await asyncio.sleep(3)
-                logger.info("Successfully clicked People tab")
-                return page.url
-            else:
-                logger.warning("Could not find People tab on company page")
-                return None
-                
-        except Exception as e:
-            logger.warning(f"Error clicking People tab: {str(e)}")
-            return None
+        return await _click_people_tab(page)
     
     # Route 3: Company name provided - search for company, click first result, then People tab
     elif company_name:
@@ -75,24 +122,20 @@ async def _navigate_to_people_page(page, company_name: str = None, company_url:
         # Step 1: Go to companies search page
         search_url = "https://www.linkedin.com/search/results/companies/"
         logger.info(f"Navigating to companies search: {search_url}")
-        await page.goto(search_url)
-        await asyncio.sleep(3)
+        await page.goto(search_url, wait_until="domcontentloaded")
         
         try:
             # Step 2: Find search input and enter company name
-            search_input_selectors = [
+            # All of these match the same global search box, so one union query finds it
+            search_input_selector = ", ".join([
                 'input[placeholder*="Search"]',
                 'input[aria-label*="Search"]',
                 '.search-global-typeahead__input',
                 'input[data-test-id="search-input"]'
-            ]
+            ])
+            await _wait_for_selector_quietly(page, search_input_selector)
             
-            search_input = None
-            for selector in search_input_selectors:
-                search_input = await page.query_selector(selector)
-                if search_input:
-                    logger.info(f"Found search input with selector: {selector}")
-                    break
+            search_input = await page.query_selector(search_input_selector)
             
             if not search_input:
                 logger.error("Could not find search input field")
@@ -104,12 +147,17 @@ async def _navigate_to_people_page(page, company_name: str = None, company_url:
             
             # Press Enter or click search button
             await page.keyboard.press('Enter')
-            await asyncio.sleep(3)
+            # The results page carries the query in its URL; wait for it before looking for results
+            try:
+                await page.wait_for_url("**keywords=**", timeout=10000)
+            except PlaywrightTimeoutError:
+                logger.info("Search URL did not update in time, continuing")
             logger.info("Submitted search query")
               # Step 3: Wait for results to load and click first company result
             await page.wait_for_selector('a[href*="/company/"]', timeout=10000)
             
-            # Look for first company result with updated selectors
+            # Tried in priority order: a union would return the first match in document order,
+            # and every entry is a subset of a[href*="/company/"], so it would always pick that one
             company_result_selectors = [
                 'a[data-test-app-aware-link][href*="/company/"]',
                 'a.PxxmMLACwEGNeKyVHxYCskDzzJAEcLVgZk[href*="/company/"]',
@@ -131,37 +179,11 @@ async def _navigate_to_people_page(page, company_name: str = None, company_url:
             
             # Step 4: Click on first company result
             await first_company.click()
-            await asyncio.sleep(3)
+            await _wait_for_selector_quietly(page, PEOPLE_TAB_SELECTOR)
             logger.info("Clicked on first company result")
             
-            # Step 5: Wait for company page to load and click People tab
-            try:
-                people_tab_selectors = [
-                    'a[data-control-name="people"]',
-                    'a[href$="/people/"]',
-                    'a:has-text("People")',
-                    'nav a[href*="/people"]'
-                ]
-                
-                people_tab = None
-                for selector in people_tab_selectors:
-                    people_tab = await page.query_selector(selector)
-                    if people_tab:
-                        logger.info(f"Found People tab with selector: {selector}")
-                        break
-                
-                if people_tab:
-                    await people_tab.click()
-                    await asyncio.sleep(3)
-                    logger.info("Successfully clicked People tab")
-                    return page.url
-                else:
-                    logger.warning("Could not find People tab on company page")
-                    return None
-                    
-            except Exception as e:
-                logger.warning(f"Error clicking People tab: {str(e)}")
-                return None
+            # Step 5: Click the People tab on the company page
+            return await _click_people_tab(page)
                 
         except Exception as e:
             logger.error(f"Error during company search and navigation: {str(e)}")
@@ -191,8 +213,6 @@ async def extract_company_employees(
     """
     linkedin_username = username or os.getenv("LINKEDIN_USERNAME")
     linkedin_password = password or os.getenv("LINKEDIN_PASSWORD")
-    logger = logging.getLogger(__name__)
-    
     if not linkedin_username or not linkedin_password:
         return "Missing LinkedIn credentials. Please provide username and password parameters or set LINKEDIN_USERNAME and LINKEDIN_PASSWORD environment variables."
     
@@ -204,23 +224,9 @@ async def extract_company_employees(
     logger.info(f"Company name: {company_name}")
     logger.info(f"Company URL: {company_url}")
     
-    async with async_playwright() as p:
-        try:
-            logger.info("Launching Playwright browser...")
-            context_args = {}
-            if os.path.exists(STORAGE_STATE_PATH):
-                context_args['storage_state'] = STORAGE_STATE_PATH
-            
-            browser = await p.chromium.launch(headless=False)
-            context = await browser.new_context(**context_args)
-            page = await context.new_page()
-            
-            # Login to LinkedIn
-            logged_in = await ensure_linkedin_login(page, linkedin_username, linkedin_password)
-            if not logged_in:
-                await browser.close()
-                return "Login failed or took too long."
-            
+    try:
+        logger.info("Checking out pooled browser context...")
+        async with lease(linkedin_username, linkedin_password) as page:
             # Navigate to people page
             people_page_url = await _navigate_to_people_page(page, company_name, company_url)
             
@@ -231,74 +237,52 @@ async def extract_company_employees(
                 attempts = 0
                 last_count = 0
                 max_attempts = 30
-                current_scroll_position = 0
+                processed_count = 0
+                show_more_button = page.locator('button.scaffold-finite-scroll__load-button').first
                 
                 while len(employees) < max_employees and attempts < max_attempts:
                     attempts += 1
-                    # Get current scroll position and new scroll height
-                    current_scroll_position = await page.evaluate('() => window.pageYOffset')
-                    scroll_height = await page.evaluate('() => document.body.scrollHeight')
-                    
-                    # Only scroll from current position to new height
-                    if current_scroll_position < scroll_height:
-                        for y in range(current_scroll_position, scroll_height, 500):
-                            await page.evaluate(f'window.scrollTo(0, {y})')
-                            await asyncio.sleep(1)
-
+                    # Let lazy loading run until the list stops growing
+                    await page.evaluate(SCROLL_TO_END_JS)
                     
                     # Wait for profile cards to be visible
                     try:
-                        # Get profile cards from LinkedIn people page
-                        profile_cards = await page.locator('.org-people-profile-card__profile-info').element_handles()
-                        logger.info(f"Found {len(profile_cards)} profile cards")
+                        # Read the fields of the cards loaded since the last pass in one round-trip
+                        profile_cards = await page.evaluate(PROFILE_CARDS_JS, processed_count)
+                        processed_count += len(profile_cards)
+                        logger.info(f"Found {processed_count} profile cards ({len(profile_cards)} new)")
                         
-                        # Extract data from each profile card
-                        for i, card in enumerate(profile_cards):
-                            try:
-                                # Extract profile URL from the title link
-                                profile_link = await card.query_selector('.artdeco-entity-lockup__title a')
-                                if profile_link:
-                                    profile_url = await profile_link.get_attribute('href')
-                                    # Clean the URL (remove miniProfileUrn parameter)
-                                    if profile_url and '?' in profile_url:
-                                        profile_url = profile_url.split('?')[0]
-                                else:
-                                    profile_url = None
-                                
-                                # Skip if we've already seen this profile URL
-                                if profile_url and profile_url in seen_urls:
-                                    continue
-                                
-                                if profile_url:
-                                    seen_urls.add(profile_url)
-                                
-                                # Extract name from the title link
-                                name_element = await card.query_selector('.artdeco-entity-lockup__title a .lt-line-clamp')
-                                name = await name_element.inner_text() if name_element else "N/A"
-                                name = name.strip()
-                                
-                                # Extract headline from subtitle
-                                headline_element = await card.query_selector('.artdeco-entity-lockup__subtitle .lt-line-clamp')
-                                headline = await headline_element.inner_text() if headline_element else "N/A"
-                                headline = headline.strip()
-                                
-                                
-                                # Add to employees list if we have valid data
-                                if name and name != "N/A" and name != "LinkedIn Member":
-                                    employees.append({
-                                        'name': name,
-                                        'headline': headline,
-                                        'profile_url': profile_url or "N/A"
-                                    })
-                                    logger.info(f"Extracted: {name} - {headline}")
-                                
-                                # Stop if we've reached max employees
-                                if len(employees) >= max_employees:
-                                    break
-                                    
-                            except Exception as card_error:
-                                logger.warning(f"Error extracting data from card {i+1}: {card_error}")
+                        for card in profile_cards:
+                            profile_url = card["profile_url"]
+                            # Clean the URL (remove miniProfileUrn parameter)
+                            if profile_url and '?' in profile_url:
+                                profile_url = profile_url.split('?')[0]
+                            
+                            # Skip if we've already seen this profile URL
+                            if profile_url and profile_url in seen_urls:
                                 continue
+                            
+                            if profile_url:
+                                seen_urls.add(profile_url)
+                            
+                            name = card["name"] if card["name"] is not None else "N/A"
+                            name = name.strip()
+                            headline = card["headline"] if card["headline"] is not None else "N/A"
+                            headline = headline.strip()
+                            
+                            # Add to employees list if we have valid data
+                            if name and name != "N/A" and name != "LinkedIn Member":
+                                employees.append({
+                                    'name': name,
+                                    'headline': headline,
+                                    'profile_url': profile_url or "N/A",
+                                    'designation_score': _designation_score(headline)
+                                })
+                                logger.info(f"Extracted: {name} - {headline}")
+                            
+                            # Stop if we've reached max employees
+                            if len(employees) >= max_employees:
+                                break
                         logger.info(f"Total employees extracted so far: {len(employees)}")
                         
                     except Exception as e:
@@ -308,34 +292,34 @@ async def extract_company_employees(
                     if last_count == len(employees):
                         # No new employees found, try to click 'Show more' button
                         try:
-                            show_more_btn = await page.query_selector('button.scaffold-finite-scroll__load-button')
-                            if show_more_btn and await show_more_btn.is_enabled():
-                                # Update current scroll position before clicking
-                                current_scroll_position = await page.evaluate('() => window.pageYOffset')
-                                await show_more_btn.click()
-                                await asyncio.sleep(2)
-                                logger.info("Clicked 'Show more results' button")
-                            else:
-                                logger.info("No more 'Show more results' button found - breaking")
-                                break
+                            # The locator click waits for the button to be visible and enabled;
+                            # timing out means there is nothing more to load
+                            await show_more_button.click(timeout=3000)
+                            logger.info("Clicked 'Show more results' button")
+                        except PlaywrightTimeoutError:
+                            logger.info("No more 'Show more results' button found - breaking")
+                            break
                         except Exception as e:
                             logger.info(f"No more 'Show more results' button or error: {str(e)} - breaking")
                             break
+                        try:
+                            await page.wait_for_function(
+                                "prev => document.querySelectorAll('.org-people-profile-card__profile-info').length > prev",
+                                arg=processed_count,
+                                timeout=10000
+                            )
+                        except PlaywrightTimeoutError:
+                            logger.info("'Show more results' did not add new cards in time")
                     
                     last_count = len(employees)
-                import pandas as pd
-                df = pd.DataFrame(employees)
-                await browser.close()
-                return df.to_csv(index=False)
+                # Highest designations first; sort is stable so page order breaks ties
+                employees.sort(key=lambda e: e['designation_score'], reverse=True)
+                return to_csv(employees, EMPLOYEE_FIELDS)
             else:
-                await browser.close()
                 return f"Failed to navigate to people page for company: {company_name or company_url}"
                 
-        except Exception as e:
-            if 'browser' in locals():
-                try:
-                    await browser.close()
-                except:
-                    pass
-            logger.error(f"Error during navigation: {str(e)}")
-            return f"Error: {str(e)}"
+    except LoginError:
+        return "Login failed or took too long."
+    except Exception as e:
+        logger.error(f"Error during navigation: {str(e)}")
+        return f"Error: {str(e)}"
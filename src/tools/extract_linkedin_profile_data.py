@@ -1,37 +1,51 @@
 import os
 import logging
-import pandas as pd
 import re
-from playwright.async_api import async_playwright
-from .linkedin_login import ensure_linkedin_login, STORAGE_STATE_PATH
-import asyncio
+from .linkedin_session import lease, LoginError
+from .csv_utils import to_csv
+from . import llm_cache
+from .gemini import GEMINI_MODEL, gemini_client
 import json
-from google import genai
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Profile text sits between the "Skip to search" line and the Interests heading.
+# The skip link is outside <main>, so text read from <main> alone starts at the profile.
+SKIP_MARK = 'Skip to search'
+STOP_MARK = 'InterestsInterests'
+
+# Text of the profile column only (no nav, sidebar or footer), read in one call
+PROFILE_TEXT_JS = "() => (document.querySelector('main') || document.body).textContent"
+
+# Most profile text sent to Gemini; anything past this is dropped before the line pass
+MAX_PROFILE_CHARS = 120_000
+# Inline JSON-like blobs LinkedIn leaves in the page text (never spanning lines)
+DICT_BLOCK_RE = re.compile(r'\{[^}\n]*\}[^\S\n]*')
 
 def _clean_profile_text(raw_text: str) -> str:
     if not raw_text:
         return ""
-    lines = raw_text.split('\n')
-    cleaned_lines = []
-    skip_to_search_found = False
-    for line in lines:
-        if not skip_to_search_found:
-            if 'Skip to search' in line:
-                skip_to_search_found = True
-            continue
-        cleaned_line = re.sub(r'\{.*?\}\s*', '', line, flags=re.DOTALL)
-        if cleaned_line.strip():
-            cleaned_lines.append(cleaned_line.strip())
-        if 'InterestsInterests' in cleaned_line:
-            break
-    return "\n".join(cleaned_lines)
+    start = raw_text.find(SKIP_MARK)
+    if start != -1:
+        start = raw_text.find('\n', start)
+        if start == -1:
+            return ""
+        raw_text = raw_text[start + 1:]
+    text = DICT_BLOCK_RE.sub('', raw_text)
+    # Keep the line holding the Interests heading, drop everything after it
+    stop = text.find(STOP_MARK)
+    if stop != -1:
+        end = text.find('\n', stop)
+        if end != -1:
+            text = text[:end]
+    text = text[:MAX_PROFILE_CHARS]
+    # Strip each line once; filter drops the ones that end up empty
+    return "\n".join(filter(None, (line.strip() for line in text.split('\n'))))
 
-async def _extract_data_with_gemini(content: str, api_key: str) -> dict:
-    try:
-        llm = genai.Client(api_key=api_key)
-        model = "gemini-2.0-flash"
-        prompt = f"""
-You are an expert LinkedIn profile data extraction specialist with deep understanding of professional profile structures and date formats. Your task is to meticulously extract structured information from the LinkedIn profile text below and return a perfectly formatted JSON object.
+# Static extraction instructions, sent as the system instruction so each request only carries the profile text
+EXTRACTION_SYSTEM = """
+You are an expert LinkedIn profile data extraction specialist with deep understanding of professional profile structures and date formats. Your task is to meticulously extract structured information from the LinkedIn profile text you are given and return a perfectly formatted JSON object.
 CRITICAL REQUIREMENTS:
 1. Return ONLY valid JSON - no explanations, comments, or additional text
 2. Use double quotes for all JSON keys and string values
@@ -60,13 +74,13 @@ EXTRACTION GUIDELINES:
 - Include proficiency levels if mentioned
 **OUTPUT FORMAT:**
 Return a JSON object with these exact field names:
-{{
+{
   "Name": "string",
   "Headline": "string", 
   "Location": "string",
   "About": "string",
   "Experience": [
-    {{
+    {
       "Title": "string",
       "Company": "string",
       "Employment_Type": "string",
@@ -75,10 +89,10 @@ Return a JSON object with these exact field names:
       "Duration": "string",
       "Location": "string",
       "Description": "string"
-    }}
+    }
   ],
   "Education": [
-    {{
+    {
       "Institution": "string",
       "Degree": "string",
       "Field_of_Study": "string",
@@ -86,36 +100,71 @@ Return a JSON object with these exact field names:
       "End_Date": "string",
       "Grade": "string",
       "Activities": "string"
-    }}
+    }
   ],
   "Skills": "comma-separated string of all skills",
   "Certifications": "comma-separated string of certifications",
   "Languages": "comma-separated string of languages"
-}}
+}
 DEFAULT VALUES:
 - Use empty string "" for missing text fields
 - Use empty array [] for missing Experience/Education
 - For dates: use "Not specified" if completely missing
 - For End_Date: use "Present" if still ongoing
-LINKEDIN PROFILE TEXT:
-{content}
 """
-        response = await asyncio.to_thread(
-            llm.models.generate_content,
+
+# Recent extractions, keyed by a hash of the model, instructions and profile text.
+# Checked before the on-disk llm_cache, which survives restarts when LLM_CACHE_DIR is set.
+GEMINI_CACHE_SIZE = int(os.getenv("GEMINI_LRU", 256))
+_gemini_cache = OrderedDict()
+
+async def _extract_data_with_gemini(content: str, api_key: str) -> dict:
+    key = llm_cache.cache_key(GEMINI_MODEL, EXTRACTION_SYSTEM, content)
+    if key in _gemini_cache:
+        _gemini_cache.move_to_end(key)
+        return _gemini_cache[key]
+    data = llm_cache.get(key)
+    if data is None:
+        data = await _call_gemini(content, api_key)
+        # Failed extractions are not cached so the next call retries them
+        if data is not None:
+            llm_cache.put(key, data)
+    if data is not None:
+        _gemini_cache[key] = data
+        if len(_gemini_cache) > GEMINI_CACHE_SIZE:
+            _gemini_cache.popitem(last=False)
+    return data
+
+async def _call_gemini(content: str, api_key: str) -> dict:
+    try:
+        llm = gemini_client(api_key)
+        model = GEMINI_MODEL
+        # Native async streaming: no worker thread, and chunks are collected as they arrive
+        chunks = []
+        async for chunk in await llm.aio.models.generate_content_stream(
             model=model,
-            contents=prompt
-        )
-        raw_response = response.text.strip()
-        if raw_response.startswith("```json") or raw_response.startswith("````"):
-            raw_response = raw_response.replace("```json", "").replace("```", "").strip()
-        json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            data = json.loads(json_str)
-            validated_data = _validate_and_format_for_csv(data)
-            return validated_data
-        else:
-            return None
+            contents=f"LINKEDIN PROFILE TEXT:\n{content}",
+            # JSON mode: the model returns a bare JSON object, no fences or commentary
+            config={
+                "system_instruction": EXTRACTION_SYSTEM,
+                "response_mime_type": "application/json",
+                "temperature": 0.1
+            }
+        ):
+            if chunk.text:
+                chunks.append(chunk.text)
+        raw_response = "".join(chunks).strip()
+        try:
+            data = json.loads(raw_response)
+        except json.JSONDecodeError:
+            # Fallback in case the model still wraps the object in text or code fences:
+            # the outermost object runs from the first '{' to the last '}'
+            start = raw_response.find('{')
+            end = raw_response.rfind('}')
+            if start == -1 or end < start:
+                return None
+            data = json.loads(raw_response[start:end + 1])
+        return _validate_and_format_for_csv(data)
     except Exception:
         return None
 
@@ -189,52 +238,38 @@ async def extract_linkedin_profile_data(
     linkedin_username = username or os.getenv("LINKEDIN_USERNAME")
     linkedin_password = password or os.getenv("LINKEDIN_PASSWORD")
     google_api_key = os.getenv("GOOGLE_API_KEY")
-    logger = logging.getLogger(__name__)
     if not linkedin_username or not linkedin_password:
         return "Missing LinkedIn credentials. Please provide username and password parameters or set LINKEDIN_USERNAME and LINKEDIN_PASSWORD environment variables."
     if not google_api_key:
         return "Missing Google API key. Please set GOOGLE_API_KEY environment variable."
     logger.info(f"Starting LinkedIn profile data extraction")
     logger.info(f"Target profile URL: {profile_url}")
-    async with async_playwright() as p:
-        try:
-            logger.info("Launching Playwright browser...")
-            context_args = {}
-            if os.path.exists(STORAGE_STATE_PATH):
-                context_args['storage_state'] = STORAGE_STATE_PATH
-            browser = await p.chromium.launch(headless=False)
-            context = await browser.new_context(**context_args)
-            page = await context.new_page()
-            logged_in = await ensure_linkedin_login(page, linkedin_username, linkedin_password)
-            if not logged_in:
-                await browser.close()
-                return "Login failed or took too long."
+    try:
+        logger.info("Checking out pooled browser context...")
+        async with lease(linkedin_username, linkedin_password) as page:
             logger.info(f"Navigating to profile: {profile_url}")
-            await page.goto(profile_url)
-            await page.wait_for_load_state()
-            await asyncio.sleep(3)
+            await page.goto(profile_url, wait_until="domcontentloaded")
+            await page.wait_for_selector("main", timeout=15000)
             logger.info("Profile page loaded, extracting content...")
             try:
-                page_text = await page.locator('body').text_content()
+                page_text = await page.evaluate(PROFILE_TEXT_JS)
                 logger.info("Successfully extracted page content")
             except Exception as e:
                 logger.error(f"Error extracting page content: {e}")
-                await browser.close()
                 return f"Error extracting page content: {str(e)}"
-            await browser.close()
-            logger.info("Cleaning extracted text...")
-            cleaned_text = _clean_profile_text(page_text)
-            logger.info("Processing text with Gemini AI...")
-            profile_data = await _extract_data_with_gemini(cleaned_text, google_api_key)
-            if profile_data:
-                df = pd.DataFrame([profile_data])
-                csv_data = df.to_csv(index=False)
-                logger.info("Successfully extracted and formatted profile data")
-                return csv_data
-            else:
-                return "Failed to extract profile data using AI."
-        except Exception as e:
-            if 'browser' in locals():
-                await browser.close()
-            logger.error(f"Error in profile extraction: {str(e)}")
-            return f"Error: {str(e)}"
+        # The page is back in the pool before the slow Gemini call
+        logger.info("Cleaning extracted text...")
+        cleaned_text = _clean_profile_text(page_text)
+        logger.info("Processing text with Gemini AI...")
+        profile_data = await _extract_data_with_gemini(cleaned_text, google_api_key)
+        if profile_data:
+            csv_data = to_csv([profile_data], list(profile_data.keys()))
+            logger.info("Successfully extracted and formatted profile data")
+            return csv_data
+        else:
+            return "Failed to extract profile data using AI."
+    except LoginError:
+        return "Login failed or took too long."
+    except Exception as e:
+        logger.error(f"Error in profile extraction: {str(e)}")
+        return f"Error: {str(e)}"
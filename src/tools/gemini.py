@@ -0,0 +1,14 @@
+from functools import lru_cache
+
+# Model used by every tool that calls Gemini
+GEMINI_MODEL = "gemini-2.0-flash"
+
+
+@lru_cache(maxsize=None)
+def gemini_client(api_key: str):
+    """
+    One Gemini client per API key, shared by all tools and reused across calls.
+    """
+    # Imported here so server start-up doesn't pay for the Gemini SDK
+    from google import genai
+    return genai.Client(api_key=api_key)
@@ -2,12 +2,15 @@ import os
 import logging
 from googlesearch import search
 import json
-from google import genai
 from dotenv import load_dotenv
 from typing import List, Dict
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import time
+from . import llm_cache
+from .gemini import GEMINI_MODEL, gemini_client
+from .http_utils import fetch_all
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +18,15 @@ load_dotenv()
 # Configure Google Gemini AI
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 
+# Only these tags are built into the tree on the first parse; the meta description usually has the post
+HEAD_TAGS = SoupStrainer(["meta", "title"])
+
+# Most characters kept from each post
+MAX_POST_CONTENT = 2000
+
+# Most post pages fetched at the same time
+POST_FETCH_CONCURRENCY = 5
+
 # System prompt for generating LinkedIn posts
 LINKEDIN_POST_SYSTEM_PROMPT = """You are an elite LinkedIn content strategist who creates viral, thought-provoking posts for industry leaders. Your task is to analyze extracted LinkedIn posts and create ONE exceptional, ready-to-post LinkedIn post that drives massive engagement.
 
@@ -64,36 +76,40 @@ OUTPUT REQUIREMENTS:
 - Create content that stops the scroll and demands engagement
 - Focus on delivering exceptional value that people want to share"""
 
-def _scrape_linkedin_post_content(url: str) -> str:
+# Per-request prompt; only the placeholders change between calls
+LINKEDIN_POST_USER_PROMPT = """
+Based on the following extracted LinkedIn posts about {topic}, create ONE exceptional LinkedIn post that goes viral.
+
+EXTRACTED CONTENT:
+{extracted_content}
+
+{description_block}
+
+Create a thought-provoking, insight-rich LinkedIn post that challenges conventional thinking and delivers massive value. Make it longer, deeper, and more engaging than typical posts. Include specific examples, actionable frameworks, and bold insights that position the author as a visionary thought leader.
+
+Output only the final post - no analysis or commentary.
+"""
+
+# Inserted into the user prompt when the caller gives a description
+DESCRIPTION_BLOCK_TEMPLATE = """ADDITIONAL DESCRIPTION/FEEDBACK:
+{description}
+
+Please incorporate this feedback and direction into your post creation.
+"""
+
+def _parse_linkedin_post_content(html: bytes) -> str:
     """
-    Scrape the body text content from a LinkedIn post URL.
+    Extract the body text content from a fetched LinkedIn post page.
     
     Args:
-        url (str): LinkedIn post URL
+        html (bytes): Raw HTML of the post page
     
     Returns:
         str: Extracted body text from the post
     """
-    logger = logging.getLogger(__name__)
-    
     try:
-        # Set headers to mimic a real browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-        }
-        
-        logger.info(f"Scraping content from: {url}")
-        
-        # Send GET request
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Parse HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Parse only the meta and title tags; the full tree is built below if they are not enough
+        soup = BeautifulSoup(html, 'html.parser', parse_only=HEAD_TAGS)
         
         # Try different selectors to find post content
         post_content = ""
@@ -111,75 +127,91 @@ def _scrape_linkedin_post_content(url: str) -> str:
             title_text = title.get_text(strip=True) if title else ""
             
             # Try to extract main content
-            main_content = soup.find('main')
+            main_content = BeautifulSoup(html, 'html.parser').find('main')
             if main_content:
                 # Remove script and style elements
                 for script in main_content(["script", "style"]):
                     script.decompose()
-                post_content = main_content.get_text(strip=True)[:500]  # Limit to first 500 chars
+                post_content = main_content.get_text(strip=True)
             else:
                 post_content = title_text
         
+        post_content = post_content[:MAX_POST_CONTENT]
         logger.info(f"Extracted {len(post_content)} characters of content")
         return post_content
         
     except Exception as e:        
-        logger.error(f"Error scraping LinkedIn post content: {str(e)}")
-        return f"Error scraping content: {str(e)}"
+        logger.error(f"Error parsing LinkedIn post content: {str(e)}")
+        return f"Error parsing content: {str(e)}"
 
-def _generate_linkedin_posts_with_ai(extracted_content: str, topic: str = "", description: str = None) -> str:
+async def _generate_linkedin_posts_with_ai(posts_content: str, topic: str = "", num_posts: int = 0, description: str = None) -> str:
     """
     Generate LinkedIn posts using Google Gemini AI based on extracted content.
     
     Args:
-        extracted_content (str): The extracted LinkedIn posts content
+        posts_content (str): The extracted LinkedIn post blocks
         topic (str): Optional topic for focused content generation
+        num_posts (int): Number of posts found for the topic, shown in the content header
         description (str): Optional description/feedback for content customization
     
     Returns:
         str: Generated LinkedIn posts
     """
-    logger = logging.getLogger(__name__)
-    
     if not GOOGLE_API_KEY:
         return "Error: GOOGLE_API_KEY not found in environment variables. Please add it to your .env file"
     
     try:
-        # Initialize Gemini client
-        llm = genai.Client(api_key=GOOGLE_API_KEY)
-        model = "gemini-2.0-flash"
+        model = GEMINI_MODEL
+        
+        # Header goes in front of the posts; only its timestamp is left out of the cache key
+        header_parts = []
+        header_parts.append(f"Subject: {topic}")
+        header_parts.append(f"Number of Posts: {num_posts}")
+        header_parts.append(f"Extracted at: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        header_parts.append("=" * 80)
+        header_parts.append("")
+        extracted_content = "\n".join(header_parts) + "\n" + posts_content
         
         # Create the prompt
-        user_prompt = f"""
-Based on the following extracted LinkedIn posts about {topic}, create ONE exceptional LinkedIn post that goes viral.
-
-EXTRACTED CONTENT:
-{extracted_content}
-
-{f'''ADDITIONAL DESCRIPTION/FEEDBACK:
-{description}
-
-Please incorporate this feedback and direction into your post creation.
-''' if description else ''}
-
-Create a thought-provoking, insight-rich LinkedIn post that challenges conventional thinking and delivers massive value. Make it longer, deeper, and more engaging than typical posts. Include specific examples, actionable frameworks, and bold insights that position the author as a visionary thought leader.
-
-Output only the final post - no analysis or commentary.
-"""
+        description_block = DESCRIPTION_BLOCK_TEMPLATE.format(description=description) if description else ''
+        user_prompt = LINKEDIN_POST_USER_PROMPT.format(
+            topic=topic,
+            extracted_content=extracted_content,
+            description_block=description_block
+        )
         
         # Combine system prompt and user prompt
         full_prompt = LINKEDIN_POST_SYSTEM_PROMPT + "\n\n" + user_prompt
         
+        # Same model, prompt templates, topic, post count, description and posts as an earlier call: reuse its post
+        cache_key = llm_cache.cache_key(
+            model,
+            LINKEDIN_POST_SYSTEM_PROMPT,
+            LINKEDIN_POST_USER_PROMPT,
+            DESCRIPTION_BLOCK_TEMPLATE,
+            topic,
+            str(num_posts),
+            description or "",
+            posts_content
+        )
+        cached_post = llm_cache.get(cache_key)
+        if cached_post:
+            logger.info("Using cached LinkedIn post for identical prompt")
+            return cached_post
+        
+        llm = gemini_client(GOOGLE_API_KEY)
+        
         logger.info("Generating LinkedIn posts with Google Gemini AI...")
         
-        # Generate content using Gemini (synchronous call)
-        response = llm.models.generate_content(
+        # Native async call, so the event loop keeps serving other tools meanwhile
+        response = await llm.aio.models.generate_content(
             model=model,
             contents=full_prompt
         )
         
         if response and hasattr(response, 'text') and response.text:
             logger.info("Successfully generated LinkedIn posts with AI")
+            llm_cache.put(cache_key, response.text)
             return response.text
         else:
             logger.error("No response received from Gemini AI")
@@ -215,8 +247,6 @@ async def generate_linkedin_content(
     Returns:
         str: AI-generated LinkedIn post ready for publishing
     """
-    logger = logging.getLogger(__name__)
-    
     # Validate inputs
     if not subject or not subject.strip():
         return "Error: Subject is required. Please provide a topic to search for."
@@ -224,9 +254,6 @@ async def generate_linkedin_content(
     if num_posts < 1 or num_posts > 20:
         return "Error: num_posts must be between 1 and 20."
     
-    # Suppress logging for clean output in MCP context
-    logging.getLogger().setLevel(logging.CRITICAL)
-    
     logger.info(f"Searching for {num_posts} LinkedIn posts about: {subject}")
     
     try:
@@ -239,21 +266,20 @@ async def generate_linkedin_content(
         if not results_list:
             return f"No LinkedIn posts found for subject: {subject}. Try a different search term."
         
-        # Build content string
+        # Build content string; the header with subject, count and timestamp is added by the generator
         content_parts = []
-        content_parts.append(f"Subject: {subject}")
-        content_parts.append(f"Number of Posts: {len(results_list)}")
-        content_parts.append(f"Extracted at: {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        content_parts.append("=" * 80)
-        content_parts.append("")
+        
+        # Fetch all posts concurrently over the shared client; bodies keep the search order
+        logger.info(f"Fetching {len(results_list)} posts, {POST_FETCH_CONCURRENCY} at a time")
+        bodies = await fetch_all([post.url for post in results_list], POST_FETCH_CONCURRENCY)
         
         successful_extractions = 0
-        for i, post in enumerate(results_list, 1):
-            logger.info(f"Processing post {i}/{len(results_list)}: {post.url}")
-            
-            # Scrape the post content
-            post_content = _scrape_linkedin_post_content(post.url)
-            
+        for i, (post, body) in enumerate(zip(results_list, bodies), 1):
+            if isinstance(body, Exception):
+                logger.error(f"Error fetching LinkedIn post {post.url}: {str(body)}")
+                post_content = None
+            else:
+                post_content = _parse_linkedin_post_content(body)
             if post_content and not post_content.startswith("Error"):
                 content_parts.append(f"POST {i}")
                 content_parts.append(f"URL: {post.url}")
@@ -267,7 +293,7 @@ async def generate_linkedin_content(
                 logger.warning(f"Failed to extract content from post {i}: {post.url}")
         
         # Join all content parts
-        extracted_content = "\n".join(content_parts)
+        posts_content = "\n".join(content_parts)
         
         if successful_extractions == 0:
             return f"Failed to extract content from any LinkedIn posts about '{subject}'. This may be due to LinkedIn's security measures or network issues."
@@ -276,7 +302,7 @@ async def generate_linkedin_content(
         
         # Generate AI content
         logger.info("Generating AI content based on extracted posts...")
-        ai_posts = _generate_linkedin_posts_with_ai(extracted_content, subject, description)
+        ai_posts = await _generate_linkedin_posts_with_ai(posts_content, subject, len(results_list), description)
         
         if ai_posts and not ai_posts.startswith("Error"):
             return ai_posts
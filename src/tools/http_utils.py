@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import httpx
+
+# Browser-like headers for public LinkedIn pages fetched without Playwright
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# Connections kept open to reuse across fetches and tool calls
+MAX_CONNECTIONS = 10
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """
+    Shared client, created on first use so it lives on the server's event loop.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=30,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+        )
+    return _client
+
+
+async def fetch_all(urls: list, max_concurrency: int = 5) -> list:
+    """
+    GET every URL concurrently, at most max_concurrency at a time.
+    Returns the response bodies in the order of urls, with the exception in
+    place of the body for any fetch that failed or returned an error status.
+    """
+    client = _get_client()
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def fetch(url):
+        async with semaphore:
+            logger.info(f"Fetching: {url}")
+            response = await client.get(url)
+        response.raise_for_status()
+        return response.content
+
+    return await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
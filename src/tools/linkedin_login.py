@@ -1,11 +1,112 @@
 import os
+import json
+import time
+import asyncio
+from urllib.parse import urlparse
 
-STORAGE_STATE_PATH = "linkedin-state.json"
+STORAGE_STATE_PATH = os.getenv("LINKEDIN_STATE_FILE", "linkedin-state.json")
+
+# How long the feed probe waits for the search box before falling back to a full login
+LOGIN_PROBE_TIMEOUT = 3000
+
+# Minimum remaining lifetime (seconds) of the li_at session cookie to skip the login probe
+SESSION_COOKIE_MIN_TTL = 300
+
+# Where LinkedIn sends a page whose session it no longer accepts
+SIGNED_OUT_PATHS = ("/login", "/uas/login", "/authwall", "/checkpoint")
+
+# Serialises writes of the storage state file across concurrently logging-in contexts
+_storage_state_lock = asyncio.Lock()
+
+# Only one context runs the feed probe or the login form at a time; the others wait and reuse its session
+_login_lock = asyncio.Lock()
+
+# li_at values that reached the feed in this process. A cookie's expiry says nothing about
+# whether LinkedIn still accepts it, so only these skip the probe.
+_verified_sessions = set()
+
+async def save_storage_state(context):
+    """
+    Write the context's storage state to a temp file and swap it into place,
+    so readers never see a half-written STORAGE_STATE_PATH.
+    """
+    tmp_path = STORAGE_STATE_PATH + f".{os.getpid()}.tmp"
+    async with _storage_state_lock:
+        await context.storage_state(path=tmp_path)
+        os.replace(tmp_path, STORAGE_STATE_PATH)
+
+async def _session_cookie(context):
+    """
+    Value of the li_at cookie if it has at least SESSION_COOKIE_MIN_TTL left, else None.
+    """
+    cookies = await context.cookies("https://www.linkedin.com")
+    for cookie in cookies:
+        if cookie["name"] == "li_at" and cookie.get("expires", -1) > time.time() + SESSION_COOKIE_MIN_TTL:
+            return cookie["value"]
+    return None
+
+async def _mark_verified(context):
+    cookie = await _session_cookie(context)
+    if cookie:
+        _verified_sessions.add(cookie)
+
+def is_signed_out_url(url: str) -> bool:
+    path = urlparse(url).path
+    return any(path == p or path.startswith(p + "/") for p in SIGNED_OUT_PATHS)
+
+async def load_saved_cookies(context):
+    """
+    Copy the cookies of the saved storage state into the context, if there is one.
+    """
+    try:
+        with open(STORAGE_STATE_PATH, encoding="utf-8") as f:
+            cookies = json.load(f).get("cookies", [])
+    except (OSError, ValueError):
+        return
+    if cookies:
+        await context.add_cookies(cookies)
 
 async def ensure_linkedin_login(page, linkedin_username, linkedin_password):
+    if await _session_cookie(page.context) in _verified_sessions:
+        return True
+    async with _login_lock:
+        # Another context may have logged in and saved its session while this one waited
+        try:
+            await load_saved_cookies(page.context)
+        except Exception:
+            pass
+        if await _session_cookie(page.context) in _verified_sessions:
+            return True
+        return await _login(page, linkedin_username, linkedin_password)
+
+async def reset_linkedin_login(page, linkedin_username, linkedin_password):
+    """
+    LinkedIn signed this context's session out: forget it, drop the saved
+    storage state and log in again.
+    """
+    stale = await _session_cookie(page.context)
+    async with _login_lock:
+        _verified_sessions.discard(stale)
+        await page.context.clear_cookies()
+        # Another context may already have logged in again while this one waited
+        try:
+            await load_saved_cookies(page.context)
+        except Exception:
+            pass
+        if await _session_cookie(page.context) in _verified_sessions:
+            return True
+        await page.context.clear_cookies()
+        try:
+            os.remove(STORAGE_STATE_PATH)
+        except FileNotFoundError:
+            pass
+        return await _login(page, linkedin_username, linkedin_password)
+
+async def _login(page, linkedin_username, linkedin_password):
     await page.goto("https://www.linkedin.com/feed/")
     try:
-        await page.wait_for_selector("input[aria-label='Search']", timeout=8000)
+        await page.wait_for_selector("input[aria-label='Search']", timeout=LOGIN_PROBE_TIMEOUT)
+        await _mark_verified(page.context)
         return True
     except Exception:
         pass
@@ -17,8 +118,8 @@ async def ensure_linkedin_login(page, linkedin_username, linkedin_password):
     await page.click("button[type='submit']")
     try:
         await page.wait_for_selector("input[aria-label='Search']", timeout=60000)
-        context = page.context
-        await context.storage_state(path=STORAGE_STATE_PATH)
+        await save_storage_state(page.context)
+        await _mark_verified(page.context)
         return True
     except Exception:
         return False
@@ -0,0 +1,43 @@
+import logging
+from contextlib import asynccontextmanager
+from .browser_pool import pool
+from .linkedin_login import ensure_linkedin_login, reset_linkedin_login, is_signed_out_url
+
+logger = logging.getLogger(__name__)
+
+
+class LoginError(Exception):
+    pass
+
+
+@asynccontextmanager
+async def lease(linkedin_username, linkedin_password):
+    """
+    Borrow a page from the shared browser pool that is logged into LinkedIn.
+    Raises LoginError if the login does not succeed, or if LinkedIn sends the
+    page to its login, authwall or checkpoint page while it is in use; the
+    session is then reset and logged in again for the next call.
+    """
+    async with pool.page() as page:
+        logged_in = await ensure_linkedin_login(page, linkedin_username, linkedin_password)
+        if not logged_in:
+            raise LoginError("Login failed or took too long.")
+        signed_out = []
+
+        def on_navigated(frame):
+            if frame == page.main_frame and is_signed_out_url(frame.url):
+                signed_out.append(frame.url)
+
+        page.on("framenavigated", on_navigated)
+        try:
+            yield page
+        except Exception:
+            # Whatever failed on a signed-out page is reported as the login problem below
+            if not signed_out:
+                raise
+        finally:
+            page.remove_listener("framenavigated", on_navigated)
+        if signed_out:
+            logger.warning(f"LinkedIn session was signed out (redirected to {signed_out[0]}), logging in again...")
+            await reset_linkedin_login(page, linkedin_username, linkedin_password)
+            raise LoginError("Login failed or took too long.")
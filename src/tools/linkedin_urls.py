@@ -0,0 +1,7 @@
+def canonical_profile_url(profile_url: str) -> str:
+    """
+    Dedup key for a profile link: no query string or fragment, no trailing slash, lowercase.
+    """
+    if not profile_url:
+        return profile_url
+    return profile_url.split('#', 1)[0].split('?', 1)[0].rstrip('/').lower()
@@ -0,0 +1,59 @@
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+
+# Directory for cached LLM responses; caching is off unless this is set
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR")
+
+# Entries older than this (seconds) are treated as missing and overwritten
+LLM_CACHE_TTL = 7 * 24 * 3600
+
+
+def cache_key(*parts: str) -> str:
+    """
+    SHA-256 over the length-prefixed parts, so moving text between parts
+    (e.g. prompt and content) can never produce the same key.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode()
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def get(key: str):
+    """
+    Return the cached value for key, or None if caching is off, the entry is
+    missing or expired, or the file can't be read.
+    """
+    if not LLM_CACHE_DIR:
+        return None
+    path = Path(LLM_CACHE_DIR) / f"{key}.json"
+    try:
+        if time.time() - path.stat().st_mtime > LLM_CACHE_TTL:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def put(key: str, value) -> None:
+    """
+    Store a JSON-serialisable value under key. Written to a temp file and
+    swapped into place so concurrent readers never see a partial entry.
+    """
+    if not LLM_CACHE_DIR:
+        return
+    cache_dir = Path(LLM_CACHE_DIR)
+    tmp_path = cache_dir / f"{key}.{os.getpid()}.tmp"
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, cache_dir / f"{key}.json")
+    except OSError:
+        pass
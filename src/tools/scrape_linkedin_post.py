@@ -1,125 +1,258 @@
 import os
 import logging
-import pandas as pd
 import re
-from playwright.async_api import async_playwright
-from tools.linkedin_login import ensure_linkedin_login, STORAGE_STATE_PATH
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from tools.linkedin_session import lease, LoginError
+from tools.csv_utils import to_csv
+from tools.linkedin_urls import canonical_profile_url
 import asyncio
+from fastmcp import Context
+
+logger = logging.getLogger(__name__)
+
+# Word-bounded with capped runs so a long token without an '@' fails fast instead of rescanning
+EMAIL_RE = re.compile(r'\b[\w.+\-]{1,64}@[\w\-]{1,63}(?:\.[\w\-]{1,63})*\.[A-Za-z]{2,24}\b')
+
+# Most comment loads (scroll or "Load more") per post
+LOAD_MORE_MAX = int(os.getenv("LINKEDIN_LOAD_MORE_MAX", 10))
+# After two loads, stop once a pass adds fewer new results than this (unset: n // 10, at least 1)
+LOAD_MORE_MIN_YIELD = os.getenv("LINKEDIN_LOAD_MORE_MIN_YIELD")
+
+# Installed once per page so each harvest pass only sends a short call over CDP.
+# Collects the fields of every comment entity from `start` onwards in one round-trip.
+# Comment bodies are pre-filtered in the page (skip prefixes and an email hint), so author fields
+# are only read, and only sent back, for comments that can produce a row.
+COMMENT_HARVEST_INIT_JS = """
+(() => {
+    const ENTITY_SEL = 'article.comments-comment-entity';
+    const URL_SEL = 'a.comments-comment-meta__description-container';
+    // Name and headline are looked up inside the author link, so a single class is enough
+    const NAME_SEL = 'span.comments-comment-meta__description-title';
+    const HEADLINE_SEL = 'div.comments-comment-meta__description-subtitle';
+    const BODY_SEL = 'span.comments-comment-item__main-content';
+    // Looser than EMAIL_RE (JS \\w is ASCII-only); the exact match still happens in Python
+    const EMAIL_HINT_RE = /[^\\s@]@[^\\s@]+\\.[A-Za-z]{2,}/;
+    window.__harvestComments = (start, skipPrefixes) => {
+        const entities = Array.from(document.querySelectorAll(ENTITY_SEL)).slice(start);
+        const comments = [];
+        for (const entity of entities) {
+            const comment = entity.querySelector(BODY_SEL);
+            const comment_text = comment ? comment.innerText.trim() : '';
+            if (skipPrefixes.some(prefix => comment_text.startsWith(prefix))) continue;
+            if (!EMAIL_HINT_RE.test(comment_text)) continue;
+            const link = entity.querySelector(URL_SEL);
+            const name = link ? link.querySelector(NAME_SEL) : null;
+            const headline = link ? link.querySelector(HEADLINE_SEL) : null;
+            const href = link ? link.getAttribute('href') : null;
+            comments.push({
+                name: name ? name.innerText.trim() : null,
+                headline: headline ? headline.innerText.trim() : null,
+                profile_url: href ? href.trim() : null,
+                comment_text: comment_text
+            });
+        }
+        return {scanned: entities.length, comments: comments};
+    };
+})();
+"""
+
+COMMENT_FIELDS = ["name", "headline", "profile_url", "email"]
+
+# Comments starting with any of these are skipped in the page (replies that open with an @mention)
+SKIP_PREFIXES = ('@',)
+
+async def _iter_post_comments(page, post_url: str, n: int):
+    """
+    Yield up to n unique commenters with an email address from an already logged-in page,
+    as soon as each one is matched.
+    """
+    results = []
+    seen_profiles = set()
+    logger.info(f"Navigating to post: {post_url}")
+    await page.add_init_script(COMMENT_HARVEST_INIT_JS)
+    await page.goto(post_url, wait_until="domcontentloaded")
+    try:
+        await page.wait_for_selector("article.comments-comment-entity", timeout=15000)
+    except PlaywrightTimeoutError:
+        logger.info("No comment entities appeared on the post page")
+    logger.info("Post page loaded, starting comment extraction...")
+    load_more_clicks = 0
+    max_load_more_clicks = LOAD_MORE_MAX
+    min_yield = int(LOAD_MORE_MIN_YIELD) if LOAD_MORE_MIN_YIELD else max(1, n // 10)
+    processed_count = 0
+    load_more_button = page.locator("button", has_text="Load more comments").first
+    while len(results) < n and load_more_clicks < max_load_more_clicks:
+        # Only harvest the comments that were not processed in a previous pass
+        harvest = await page.evaluate(
+            "([start, skip]) => window.__harvestComments(start, skip)",
+            [processed_count, list(SKIP_PREFIXES)]
+        )
+        comments = harvest["comments"]
+        current_comment_count = processed_count + harvest["scanned"]
+        logger.info(f"Found {current_comment_count} comment entities on page")
+        if not harvest["scanned"] and current_comment_count > 0:
+            logger.info("No new comments loaded, breaking loop")
+            break
+        processed_count = current_comment_count
+        results_before_pass = len(results)
+        for comment in comments:
+            name = comment["name"]
+            profile_url = comment["profile_url"]
+            headline = comment["headline"]
+            comment_text = comment["comment_text"]
+            # Key on the canonical profile path so tracking params and casing don't defeat the dedup
+            profile_key = canonical_profile_url(profile_url)
+            # Skip commenters that already produced a result before scanning their text
+            if profile_key and profile_key in seen_profiles:
+                continue
+            email_match = EMAIL_RE.search(comment_text)
+            email = email_match.group(0) if email_match else ""
+            if not email:
+                continue
+            if profile_key:
+                seen_profiles.add(profile_key)
+            row = {
+                "name": name,
+                "headline": headline,
+                "profile_url": profile_url,
+                "email": email
+            }
+            results.append(row)
+            yield row
+            if len(results) >= n:
+                break
+        if len(results) >= n:
+            break
+        if load_more_clicks >= 2 and len(results) - results_before_pass < min_yield:
+            logger.info(f"Last load added {len(results) - results_before_pass} results (< {min_yield}), stopping")
+            break
+        # LinkedIn also lazy-loads comments on scroll; only fall back to the button when scrolling adds nothing.
+        # Scroll-triggered loads count against the same budget as button clicks.
+        try:
+            await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
+            await page.wait_for_function(
+                "prev => document.querySelectorAll('article.comments-comment-entity').length > prev",
+                arg=current_comment_count,
+                timeout=5000
+            )
+            load_more_clicks += 1
+            continue
+        except PlaywrightTimeoutError:
+            pass
+        try:
+            # The click timeout doubles as the check that the button exists
+            await load_more_button.click(force=True, timeout=3000)
+            load_more_clicks += 1
+            try:
+                await page.wait_for_function(
+                    "prev => document.querySelectorAll('article.comments-comment-entity').length > prev",
+                    arg=current_comment_count,
+                    timeout=10000
+                )
+            except PlaywrightTimeoutError:
+                logger.info("Load more click did not add new comments in time")
+        except Exception:
+            break
 
 async def scrape_linkedin_post(
     post_url: str, 
     n: int = 20, 
     username: str = None, 
-    password: str = None
+    password: str = None,
+    ctx: Context = None
 ) -> str:
     linkedin_username = username or os.getenv("LINKEDIN_USERNAME")
     linkedin_password = password or os.getenv("LINKEDIN_PASSWORD")
-    logger = logging.getLogger(__name__)
     if not linkedin_username or not linkedin_password:
         return "Missing LinkedIn credentials. Please provide username and password parameters or set LINKEDIN_USERNAME and LINKEDIN_PASSWORD environment variables."
     logger.info(f"Starting LinkedIn scraping for user: {linkedin_username}")
     logger.info(f"Target post URL: {post_url}")
     logger.info(f"Maximum results to return: {n}")
     results = []
-    seen_profiles = set()
-    async with async_playwright() as p:
+    try:
+        logger.info("Checking out pooled browser context...")
+        async with lease(linkedin_username, linkedin_password) as page:
+            async for row in _iter_post_comments(page, post_url, n):
+                results.append(row)
+                # Let the client follow along instead of waiting for the whole scrape
+                if ctx is not None:
+                    await ctx.report_progress(len(results), n)
+    except LoginError:
+        return "Login failed or took too long."
+    except Exception as e:
+        if not results:
+            return f"Error: {str(e)}"
+        # Keep whatever was matched before the failure
+        logger.warning(f"Scraping stopped early after {len(results)} results: {str(e)}")
+    if results:
+        return to_csv(results, COMMENT_FIELDS)
+    else:
+        return "No results found."
+
+async def scrape_linkedin_posts(
+    post_urls: list[str],
+    n: int = 20,
+    max_concurrent: int = 4,
+    username: str = None,
+    password: str = None
+) -> str:
+    """
+    Scrape commenter emails from several LinkedIn posts concurrently.
+    Args:
+        post_urls: LinkedIn post URLs to scrape
+        n: Maximum number of results per post (default: 20)
+        max_concurrent: Maximum number of posts scraped at the same time (default: 4)
+        username: LinkedIn username/email (optional, falls back to env var)
+        password: LinkedIn password (optional, falls back to env var)
+
+    Returns:
+        CSV formatted string with post_url, name, headline, profile_url and email,
+        followed by a list of the posts that could not be scraped, if any
+    """
+    linkedin_username = username or os.getenv("LINKEDIN_USERNAME")
+    linkedin_password = password or os.getenv("LINKEDIN_PASSWORD")
+    if not linkedin_username or not linkedin_password:
+        return "Missing LinkedIn credentials. Please provide username and password parameters or set LINKEDIN_USERNAME and LINKEDIN_PASSWORD environment variables."
+    if not post_urls:
+        return "Error: post_urls must contain at least one URL."
+    logger.info(f"Starting LinkedIn scraping of {len(post_urls)} posts with concurrency {max_concurrent}")
+    semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+    async def scrape_one(post_url):
+        rows = []
         try:
-            logger.info("Launching Playwright browser...")
-            context_args = {}
-            if os.path.exists(STORAGE_STATE_PATH):
-                context_args['storage_state'] = STORAGE_STATE_PATH
-            browser = await p.chromium.launch(headless=False)
-            context = await browser.new_context(**context_args)
-            page = await context.new_page()
-            logged_in = await ensure_linkedin_login(page, linkedin_username, linkedin_password)
-            if not logged_in:
-                await browser.close()
-                return "Login failed or took too long."
-            logger.info(f"Navigating to post: {post_url}")
-            await page.goto(post_url)
-            await asyncio.sleep(5)
-            logger.info("Post page loaded, starting comment extraction...")
-            load_more_clicks = 0
-            max_load_more_clicks = 10
-            initial_comment_count = 0
-            while len(results) < n and load_more_clicks < max_load_more_clicks:
-                comment_entities = await page.query_selector_all("article.comments-comment-entity")
-                current_comment_count = len(comment_entities)
-                logger.info(f"Found {current_comment_count} comment entities on page")
-                if current_comment_count == initial_comment_count and current_comment_count > 0:
-                    logger.info("No new comments loaded, breaking loop")
-                    break
-                initial_comment_count = current_comment_count
-                for entity in comment_entities:
-                    name = None
-                    profile_url = None
-                    headline = None
-                    email = ""
-                    try:
-                        profile_url_elem = await entity.query_selector("a.comments-comment-meta__description-container")
-                        if profile_url_elem:
-                            profile_url = await profile_url_elem.get_attribute("href")
-                            profile_url = profile_url.strip() if profile_url else None
-                    except Exception:
-                        pass
-                    try:
-                        name_elem = await entity.query_selector("a.comments-comment-meta__description-container h3.comments-comment-meta__description span.comments-comment-meta__description-title")
-                        if name_elem:
-                            name = await name_elem.inner_text()
-                            name = name.strip()
-                    except Exception:
-                        pass
-                    try:
-                        headline_elem = await entity.query_selector("a.comments-comment-meta__description-container div.comments-comment-meta__description-subtitle")
-                        if headline_elem:
-                            headline = await headline_elem.inner_text()
-                            headline = headline.strip()
-                    except Exception:
-                        pass
-                    comment_text = ""
-                    try:
-                        comment_elem = await entity.query_selector("span.comments-comment-item__main-content")
-                        if comment_elem:
-                            comment_text = await comment_elem.inner_text()
-                            comment_text = comment_text.strip()
-                            email_match = re.search(r'[\w\.-]+@[\w\.-]+\.[A-Za-z]{2,}', comment_text)
-                            email = email_match.group(0) if email_match else ""
-                    except Exception:
-                        email = ""
-                    if not email:
-                        continue
-                    if profile_url and profile_url in seen_profiles:
-                        continue
-                    if profile_url:
-                        seen_profiles.add(profile_url)
-                    if comment_text and comment_text.startswith('@'):
-                        continue
-                    results.append({
-                        "name": name,
-                        "headline": headline,
-                        "profile_url": profile_url,
-                        "email": email
-                    })
-                    if len(results) >= n:
-                        break
-                try:
-                    load_more_button = page.locator("button", has_text="Load more comments")
-                    if await load_more_button.count() > 0:
-                        await load_more_button.click(force=True)
-                        await asyncio.sleep(2)
-                        load_more_clicks += 1
-                    else:
-                        break
-                except Exception:
-                    break
-            await browser.close()
-            if results:
-                df = pd.DataFrame(results)
-                csv_data = df.to_csv(index=False)
-                return csv_data
-            else:
-                return "No results found."
+            async with semaphore:
+                async with lease(linkedin_username, linkedin_password) as page:
+                    async for row in _iter_post_comments(page, post_url, n):
+                        rows.append({"post_url": post_url, **row})
+        except LoginError:
+            raise
         except Exception as e:
-            if 'browser' in locals():
-                await browser.close()
-            return f"Error: {str(e)}"
+            if not rows:
+                raise
+            # Keep whatever was matched before the failure, as scrape_linkedin_post does
+            logger.warning(f"Scraping {post_url} stopped early after {len(rows)} results: {str(e)}")
+        return rows
+
+    outcomes = await asyncio.gather(*(scrape_one(url) for url in post_urls), return_exceptions=True)
+    results = []
+    failures = []
+    for post_url, outcome in zip(post_urls, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Error scraping {post_url}: {str(outcome)}")
+            reason = "Login failed or took too long." if isinstance(outcome, LoginError) else f"Error: {str(outcome)}"
+            failures.append((post_url, reason))
+            continue
+        results.extend(outcome)
+    if not results and failures and all(isinstance(outcome, LoginError) for outcome in outcomes):
+        return "Login failed or took too long."
+    failed_posts = "".join(f"- {post_url}: {reason}\n" for post_url, reason in failures)
+    if results:
+        csv_data = to_csv(results, ["post_url"] + COMMENT_FIELDS)
+        if failures:
+            csv_data += f"\nFailed to scrape {len(failures)} of {len(post_urls)} posts:\n{failed_posts}"
+        return csv_data
+    elif failures:
+        return f"No results found. Failed to scrape {len(failures)} of {len(post_urls)} posts:\n{failed_posts}"
+    else:
+        return "No results found."
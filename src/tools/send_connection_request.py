@@ -1,135 +1,111 @@
 import os
 import logging
 import asyncio
-from playwright.async_api import async_playwright
-from .linkedin_login import ensure_linkedin_login, STORAGE_STATE_PATH
+import re
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from .linkedin_session import lease, LoginError
+from .linkedin_urls import canonical_profile_url
 
-async def send_connection_request(
-    profile_url: str,
-    message: str = None,
-    username: str = None,
-    password: str = None
-) -> str:
+logger = logging.getLogger(__name__)
+
+# A profile's main page: one path segment after /in/, optional trailing slash, query or fragment
+PROFILE_URL_RE = re.compile(r'https://www\.linkedin\.com/in/[^/?#]+/?(?:[?#].*)?')
+
+# Any of these in the profile's top card means the action buttons have rendered; raced in one wait
+PROFILE_ACTIONS_SELECTOR = ', '.join([
+    'main button:has-text("More")',
+    'main button:has-text("Connect")',
+    'main button:has-text("Pending")',
+    'main button:has-text("Withdraw")'
+])
+
+# Classifies the profile's top card in one call: "pending", "connected", "connect", "more" or "none".
+# Text matching mirrors :has-text (case-insensitive substring); More must be visible, like wait_for_selector.
+PROFILE_STATE_JS = """
+() => {
+    const main = document.querySelector('main');
+    if (!main) return 'none';
+    const buttons = Array.from(main.querySelectorAll('button'));
+    const find = (text, visible) => buttons.find(b =>
+        b.textContent.toLowerCase().includes(text) && (!visible || b.getClientRects().length > 0));
+    if (find('pending') || find('withdraw')) return 'pending';
+    const more = find('more', true);
+    // The action bar holding More has only Message and More once connected
+    if (more && more.parentElement.parentElement.querySelectorAll('button').length === 2) return 'connected';
+    if (find('connect')) return 'connect';
+    return more ? 'more' : 'none';
+}
+"""
+
+# Buttons of the invitation dialog that opens after clicking Connect
+INVITE_DIALOG_SELECTOR = 'button[aria-label="Add a note"], button[aria-label="Send without a note"]'
+
+# Connection requests in progress as (task, message), keyed by account and canonical profile URL
+_inflight = {}
+
+async def _send_connection_request(profile_url: str, message: str, linkedin_username: str, linkedin_password: str) -> str:
     """
-    Send a connection request to a LinkedIn user.
-    
-    Args:
-        profile_url: LinkedIn profile URL (e.g., "https://www.linkedin.com/in/username/")
-        message: Optional connection request message (max 180 characters)
-        username: LinkedIn username/email (optional, falls back to env var)
-        password: LinkedIn password (optional, falls back to env var)
-    
-    Returns:
-        String indicating success or failure of the connection request
+    Open the profile on a pooled page and send the invitation.
     """
-    linkedin_username = username or os.getenv("LINKEDIN_USERNAME")
-    linkedin_password = password or os.getenv("LINKEDIN_PASSWORD")
-    logger = logging.getLogger(__name__)
-    
-    if not linkedin_username or not linkedin_password:
-        return "Missing LinkedIn credentials. Please provide username and password parameters or set LINKEDIN_USERNAME and LINKEDIN_PASSWORD environment variables."
-    
-    if not profile_url:
-        return "Error: profile_url is required."
-    
-    # Validate profile URL
-    if not profile_url.startswith("https://www.linkedin.com/in/"):
-        return "Error: Invalid LinkedIn profile URL. URL should start with 'https://www.linkedin.com/in/'"
-    
-    # Validate message length if provided
-    if message and len(message) > 200:  # For safety
-        return f"Error: Message too long ({len(message)} characters). Maximum allowed is 200 characters."
-
-    logger.info(f"Starting connection request to profile: {profile_url}")
-    if message:
-        logger.info(f"With message: {message}")
-    
-    async with async_playwright() as p:
-        try:
-            logger.info("Launching Playwright browser...")
-            context_args = {}
-            if os.path.exists(STORAGE_STATE_PATH):
-                context_args['storage_state'] = STORAGE_STATE_PATH
-            
-            browser = await p.chromium.launch(headless=False)
-            context = await browser.new_context(**context_args)
-            page = await context.new_page()
-            
-            # Login to LinkedIn
-            logged_in = await ensure_linkedin_login(page, linkedin_username, linkedin_password)
-            if not logged_in:
-                await browser.close()
-                return "Login failed or took too long."
-            
+    try:
+        logger.info("Checking out pooled browser context...")
+        async with lease(linkedin_username, linkedin_password) as page:
             # Navigate to the profile URL
             logger.info(f"Navigating to profile: {profile_url}")
-            await page.goto(profile_url)
-            await asyncio.sleep(3)
+            await page.goto(profile_url, wait_until="domcontentloaded")
             
-            # Wait for page to load
-            await page.wait_for_load_state('load', timeout=0)
+            # Wait for the action buttons instead of the full page load
+            try:
+                await page.wait_for_selector(PROFILE_ACTIONS_SELECTOR, timeout=15000)
+            except PlaywrightTimeoutError:
+                logger.info("Profile action buttons did not appear in time")
 
             # --- START OF INTEGRATED SEND CONNECTION LOGIC ---
 
-            # 1. Check for "Pending" or "Withdraw" (already sent request)
-            pending_button = await page.query_selector('main button:has-text("Pending"), main button:has-text("Withdraw")')
-            if pending_button:
+            # Pending, already connected, Connect or More: one probe instead of a query per button
+            profile_state = await page.evaluate(PROFILE_STATE_JS)
+
+            # 1. "Pending" or "Withdraw" (already sent request)
+            if profile_state == "pending":
                 logger.info("Connection request already pending. Skipping...")
-                await browser.close()
                 return "Connection request already pending. Skipping..."
 
-            # 2. Check for "Message" button with icon (already connected)
-            more_button = await page.wait_for_selector('main button:has-text("More")', timeout=10000)
-
-            # Get the parent container of the 'More' button (typically the div holding all main action buttons)
-            grandparent = await more_button.evaluate_handle('el => el.parentElement.parentElement')
-
-            # Count the number of buttons inside this grandparent container
-            main_action_buttons_count = await grandparent.evaluate('el => el.querySelectorAll("button").length')
-
-            if main_action_buttons_count == 2:
-                await browser.close()
+            # 2. Only "Message" and "More" in the action bar (already connected)
+            if profile_state == "connected":
                 return "Already connected. Skipping..."
 
-            # 3. Check for "Connect" or "More" (not connected)
-            connect_button = await page.query_selector('main button:has-text("Connect")')
-            if connect_button:
-                await connect_button.click()
-            else:
-                # If not found, click "More"
-                more_button = await page.query_selector('main button:has-text("More")')
-                if more_button:
-                    await more_button.click()
-                    # Wait for dropdown to appear
-                    await asyncio.sleep(1)
-                    await page.evaluate("window.scrollBy(0, 200)")
-                    # Wait for the dropdown item to be visible
-                    await page.wait_for_selector('div.artdeco-dropdown__content--is-open', timeout=10000)
-
-                    # Now locate and click the "Connect" option inside the open dropdown
-                    connect_option = page.locator('div.artdeco-dropdown__content--is-open [role="button"] span:has-text("Connect")').first
-                    if await connect_option.count() > 0:
-                        await connect_option.click()
-                    else:
-                        logger.info("Connect button not found in More menu.")
-                        await browser.close()
-                        return "Connect button not found in More menu."
+            # 3. "Connect" or "More" (not connected)
+            if profile_state == "connect":
+                await page.locator('main button:has-text("Connect")').first.click()
+            elif profile_state == "more":
+                # Same visible More button the probe found
+                await page.locator('main button:has-text("More")').filter(visible=True).first.click()
+                await page.evaluate("window.scrollBy(0, 200)")
+                # Wait for the dropdown item to be visible
+                await page.wait_for_selector('div.artdeco-dropdown__content--is-open', timeout=10000)
+
+                # Now locate and click the "Connect" option inside the open dropdown
+                connect_option = page.locator('div.artdeco-dropdown__content--is-open [role="button"] span:has-text("Connect")').first
+                if await connect_option.count() > 0:
+                    await connect_option.click()
                 else:
-                    logger.info("Neither Connect nor More button found on main profile.")
-                    await browser.close()
-                    return "Neither Connect nor More button found on main profile."
+                    logger.info("Connect button not found in More menu.")
+                    return "Connect button not found in More menu."
+            else:
+                logger.info("Neither Connect nor More button found on main profile.")
+                return "Neither Connect nor More button found on main profile."
 
             # Handle connection popup
+            try:
+                await page.wait_for_selector(INVITE_DIALOG_SELECTOR, timeout=10000)
+            except PlaywrightTimeoutError:
+                logger.info("Invitation dialog did not appear in time")
             if message:
-                # Wait for the "Add a note" button to be visible
-                await asyncio.sleep(1)
                 add_note_button = page.locator('button[aria-label="Add a note"]')
                 if await add_note_button.count() > 0:
                     await add_note_button.click()
-                    # Wait for the invitation textarea to be visible
-                    await page.wait_for_selector('textarea[name="message"]', timeout=10000)
-                    # Fill the textarea with your message
-                    await page.fill('textarea[name="message"]', message)
+                    # Fill the invitation textarea; the locator waits for it to appear
+                    await page.locator('textarea[name="message"]').fill(message, timeout=10000)
                     # Wait for the "Send invitation" button to be visible and click it
                     send_button = page.locator('button[aria-label="Send invitation"]')
                     await send_button.click()
@@ -143,20 +119,75 @@ async def send_connection_request(
                 send_button = page.locator('button[aria-label="Send without a note"]')
                 await send_button.click()
 
-            # Wait for request to be processed
-            await asyncio.sleep(3)
+            # The dialog closes once the invitation has been sent
+            try:
+                await send_button.wait_for(state="hidden", timeout=10000)
+            except PlaywrightTimeoutError:
+                logger.info("Invitation dialog did not close in time")
 
-            await browser.close()
-            
             return f"✅ Connection request sent successfully to {profile_url} with message: '{message}'"
                 
             # --- END OF INTEGRATED SEND CONNECTION LOGIC ---
 
-        except Exception as e:
-            if 'browser' in locals():
-                try:
-                    await browser.close()
-                except:
-                    pass
-            logger.error(f"Error sending connection request: {str(e)}")
-            return f"Error: {str(e)}"
+    except LoginError:
+        return "Login failed or took too long."
+    except Exception as e:
+        logger.error(f"Error sending connection request: {str(e)}")
+        return f"Error: {str(e)}"
+
+async def send_connection_request(
+    profile_url: str,
+    message: str = None,
+    username: str = None,
+    password: str = None
+) -> str:
+    """
+    Send a connection request to a LinkedIn user.
+    
+    Args:
+        profile_url: LinkedIn profile URL (e.g., "https://www.linkedin.com/in/username/")
+        message: Optional connection request message (max 180 characters)
+        username: LinkedIn username/email (optional, falls back to env var)
+        password: LinkedIn password (optional, falls back to env var)
+    
+    Returns:
+        String indicating success or failure of the connection request
+    """
+    linkedin_username = username or os.getenv("LINKEDIN_USERNAME")
+    linkedin_password = password or os.getenv("LINKEDIN_PASSWORD")
+    if not linkedin_username or not linkedin_password:
+        return "Missing LinkedIn credentials. Please provide username and password parameters or set LINKEDIN_USERNAME and LINKEDIN_PASSWORD environment variables."
+    
+    if not profile_url:
+        return "Error: profile_url is required."
+    
+    # Validate profile URL
+    if not PROFILE_URL_RE.fullmatch(profile_url):
+        return "Error: Invalid LinkedIn profile URL. URL should look like 'https://www.linkedin.com/in/username/'"
+    
+    # Validate message length if provided
+    if message and len(message) > 200:  # For safety
+        return f"Error: Message too long ({len(message)} characters). Maximum allowed is 200 characters."
+
+    logger.info(f"Starting connection request to profile: {profile_url}")
+    if message:
+        logger.info(f"With message: {message}")
+    
+    # Concurrent calls for the same account and profile share one run instead of loading the page twice
+    key = (linkedin_username, canonical_profile_url(profile_url))
+    inflight = _inflight.get(key)
+    if inflight is None:
+        task = asyncio.ensure_future(
+            _send_connection_request(profile_url, message, linkedin_username, linkedin_password)
+        )
+        _inflight[key] = (task, message)
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        task, inflight_message = inflight
+        # Only one invitation can be sent, so a different note can't ride along with the running one
+        if (inflight_message or None) != (message or None):
+            logger.info(f"Connection request to {profile_url} already in progress with a different message")
+            return f"Error: A connection request to {profile_url} is already in progress with a different message. This request was not sent."
+        logger.info(f"Connection request to {profile_url} already in progress, waiting for its result")
+    # Shielded so a cancelled caller doesn't abort the run other callers are waiting on
+    return await asyncio.shield(task)